@@ -41,17 +41,56 @@ def arg_handler_train():
     parser.add_argument('--loss-type', action='store', type=str, dest="loss_type", default="regular", help='a type on how to handle weight in loss function, options are "abs(w)" & "log(abs(w))" ')
     parser.add_argument('--BoolFilter', action='store', dest='BoolFilter', type=str, default=None, help='Comma separated list of boolean logic. e.g. \'a | b\'.')
     parser.add_argument('--n_workers', action='store', dest='n_workers', type=int, default=8, help='Number of batch workers (default: 8)')
+    parser.add_argument('--memmap', action='store_true', dest='memmap', default=False, help='Memory-map large training npy files instead of loading them into RAM')
+    parser.add_argument('--prefetch_factor', action='store', dest='prefetch_factor', type=int, default=2, help='Number of batches each DataLoader worker prefetches (default: 2)')
+    parser.add_argument('--torch-compile', action='store_true', dest='torch_compile', default=False, help='Compile the model with torch.compile before training')
+    parser.add_argument('--jit-script', action='store_true', dest='jit_script', default=False, help='Specialise the model with torch.jit.script before training (ignored if --torch-compile is set)')
+    parser.add_argument('--amp', action='store', dest='amp', type=str, choices=['off', 'bf16', 'fp16'], default='off', help='Mixed-precision mode for the model forward pass (fp16 requires CUDA)')
+    parser.add_argument('--quantize-inputs', action='store_true', dest='quantize_inputs', default=False, help='Also store the training features as uint8 with per-feature scales and reuse that smaller file on later runs')
+    parser.add_argument('--compress-artifacts', action='store_true', dest='compress_artifacts', default=False, help='Also store X/y/w as one compressed npz bundle and reuse it on later runs for faster cold loads')
+    parser.add_argument('--gpu-dataset', action='store_true', dest='gpu_dataset', default=False, help='Keep the whole dataset in GPU memory when it fits, avoiding per-batch host-to-device copies')
+    parser.add_argument('--deterministic', action='store_true', dest='deterministic', default=False, help='Keep cuDNN autotuning and TF32 matmuls disabled for bit-reproducible runs')
     parser.add_argument('--clipFeatures',  action='store', type=str, dest='clipFeatures',  default='', help='Comma separated list of features to be clipped')
     parser.add_argument('--clippingQuantile', action='store', type=float, dest='clippingQuantile', default=None, help='The quantile at which the features will be clipped')
     opts = parser.parse_args()
     return opts
 
+# Argument parsing main function for calibration step
+def arg_handler_calibrate():
+    parser = argparse.ArgumentParser(usage="usage: %(prog)s [opts]")
+    parser.add_argument('--version', action='version', version='%(prog)s 1.0')
+    parser.add_argument('-n', '--nominal',   action='store', type=str, dest='nominal',   default='', help='Nominal sample name (root file name excluding the .root extension)')
+    parser.add_argument('-v', '--variation', action='store', type=str, dest='variation', default='', help='Variation sample name (root file name excluding the .root extension)')
+    parser.add_argument('-e', '--nentries',  action='store', type=int, dest='nentries',  default=1000, help='specify the number of events the model was trained on (must match the training step)')
+    parser.add_argument('-p', '--datapath',  action='store', type=str, dest='datapath',  default='./Inputs/', help='path to where the data is stored')
+    parser.add_argument('-g', '--global_name',  action='store', type=str, dest='global_name',  default='Test', help='Global name for identifying this run - used in folder naming and output naming')
+    parser.add_argument('-f', '--features',  action='store', type=str, dest='features',  default='', help='Comma separated list of features within tree')
+    parser.add_argument('-w', '--weightFeature',  action='store', type=str, dest='weightFeature',  default='', help='Name of event weights feature in TTree')
+    parser.add_argument('-t', '--TreeName',  action='store', type=str, dest='treename',  default='Tree', help='Name of TTree name inside root files')
+    parser.add_argument('-c', '--ClipWeight',  action='store_true', dest='clip_weight',  default=False, help='Clip the weights from the neural network in order Name of TTree name inside root files')
+    parser.add_argument('--PlotROC',  action="store_true", dest='plot_ROC',  help='Flag to determine if one should plot ROC')
+    parser.add_argument('--PlotObsROC',  action="store_true", dest='plot_obs_ROC',  help='Flag to determine if one should plot observable ROCs')
+    parser.add_argument('--scale-method', action='store', dest='scale_method', type=str, default=None, help='scaling method for input data. e.g minmax, standard.')
+    opts = parser.parse_args()
+    return opts
+
+# Argument parsing main function for validation step
+def arg_handler_validate():
+    parser = argparse.ArgumentParser(usage="usage: %(prog)s [opts]")
+    parser.add_argument('--version', action='version', version='%(prog)s 1.0')
+    parser.add_argument('-s', '--samples',   action='store', type=str, dest='samples',   default='dilepton', help='samples to derive weights for. Sherpa 2.2.8 ttbar dilepton')
+    parser.add_argument('-v', '--variation', action='store', type=str, dest='variation', default='QSFUP', help='variation to derive weights for. default QSF down to QSF up')
+    parser.add_argument('-n', '--nentries',  action='store', type=int, dest='nentries',  default=1000, help='specify the number of events do do the training on, default None means full sample')
+    parser.add_argument('-p', '--datapath',  action='store', type=str, dest='datapath',  default='/eos/atlas/unpledged/group-tokyo/users/tatsuya/TruthAOD/Temp/Tuples/', help='path to where the data is stored')
+    opts = parser.parse_args()
+    return opts
+
 # Arugment parsing main function for evaluation step
 def arg_handler_eval():
     parser = argparse.ArgumentParser(usage="usage: %prog [opts]")
     parser.add_argument('-n', '--nominal',   action='store', type=str, dest='nominal',   default='', help='Nominal sample name (root file name excluding the .root extension)')
     parser.add_argument('-v', '--variation', action='store', type=str, dest='variation', default='', help='Variation sample name (root file name excluding the .root extension)')
-    parser.add_argument('-e', '--nentries',  action='store', type=str, dest='nentries',  default=1000, help='specify the number of events to do the training on, None means full sample')
+    parser.add_argument('-e', '--nentries',  action='store', type=int, dest='nentries',  default=1000, help='specify the number of events the model was trained on (must match the training step)')
     parser.add_argument('-p', '--datapath',  action='store', type=str, dest='datapath',  default='./Inputs/', help='path to where the data is stored')
     parser.add_argument('-g', '--global_name',  action='store', type=str, dest='global_name',  default='Test', help='Global name for identifying this run - used in folder naming and output naming')
     parser.add_argument('-f', '--features',  action='store', type=str, dest='features',  default='', help='Comma separated list of features within tree')
@@ -1,7 +1,7 @@
-import optparse
 import os
 import sys
 import logging
+from arg_handler import arg_handler_calibrate
 from ml import RatioEstimator
 from ml.utils.loading import Loader
 from ml.calibration import CalibratedClassifier
@@ -22,20 +22,7 @@ import numpy as np
 #loading = Loader()
 
 ###########################################
-parser = optparse.OptionParser(usage="usage: %prog [opts]", version="%prog 1.0")
-parser.add_option('-n', '--nominal',   action='store', type=str, dest='nominal',   default='', help='Nominal sample name (root file name excluding the .root extension)')
-parser.add_option('-v', '--variation', action='store', type=str, dest='variation', default='', help='Variation sample name (root file name excluding the .root extension)')
-parser.add_option('-e', '--nentries',  action='store', type=str, dest='nentries',  default=1000, help='specify the number of events to do the training on, None means full sample')
-parser.add_option('-p', '--datapath',  action='store', type=str, dest='datapath',  default='./Inputs/', help='path to where the data is stored')
-parser.add_option('-g', '--global_name',  action='store', type=str, dest='global_name',  default='Test', help='Global name for identifying this run - used in folder naming and output naming')
-parser.add_option('-f', '--features',  action='store', type=str, dest='features',  default='', help='Comma separated list of features within tree')
-parser.add_option('-w', '--weightFeature',  action='store', type=str, dest='weightFeature',  default='', help='Name of event weights feature in TTree')
-parser.add_option('-t', '--TreeName',  action='store', type=str, dest='treename',  default='Tree', help='Name of TTree name inside root files')
-parser.add_option('-c', '--ClipWeight',  action='store_true', dest='clip_weight',  default=False, help='Clip the weights from the neural network in order Name of TTree name inside root files')
-parser.add_option('--PlotROC',  action="store_true", dest='plot_ROC',  help='Flag to determine if one should plot ROC')
-parser.add_option('--PlotObsROC',  action="store_true", dest='plot_obs_ROC',  help='Flag to determine if one should plot observable ROCs')
-parser.add_option('--scale-method', action='store', dest='scale_method', type=str, default=None, help='scaling method for input data. e.g minmax, standard.')
-(opts, args) = parser.parse_args()
+opts = arg_handler_calibrate()
 nominal  = opts.nominal
 variation = opts.variation
 n = opts.nentries
@@ -1,5 +1,6 @@
 from __future__ import absolute_import, division, print_function
 
+import atexit
 import logging
 import os
 import json
@@ -10,6 +11,7 @@ import tarfile
 import onnxruntime as ort
 import onnx as onnx
 
+from concurrent.futures import ThreadPoolExecutor
 
 from .utils.tools import create_missing_folders, load_and_check
 try:
@@ -18,6 +20,49 @@ except NameError:
     FileNotFoundError = IOError
 
 logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj)
+except ImportError:
+
+    def _dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+# Rows per tile when streaming over memory-mapped training arrays
+MEMMAP_CHUNK_SIZE = 1000000
+
+
+def _streaming_moments(x, chunk_size=MEMMAP_CHUNK_SIZE):
+    """
+    Single pass over `x` in row tiles, returning per-column (mean, std, min, max)
+    with NaNs ignored, merging partial results with Chan's parallel variance
+    update. Peak memory is one tile instead of the full array.
+    """
+    n = mean = m2 = mins = maxs = None
+    for i in range(0, x.shape[0], chunk_size):
+        buf = np.asarray(x[i : i + chunk_size], dtype=np.float64)
+        c_n = np.sum(~np.isnan(buf), axis=0)
+        c_mean = np.where(c_n > 0, np.nanmean(buf, axis=0), 0.0)
+        c_m2 = np.nansum((buf - c_mean) ** 2, axis=0)
+        c_min = np.nanmin(buf, axis=0)
+        c_max = np.nanmax(buf, axis=0)
+        if n is None:
+            n, mean, m2, mins, maxs = c_n, c_mean, c_m2, c_min, c_max
+        else:
+            total = n + c_n
+            delta = c_mean - mean
+            mean = mean + delta * np.divide(c_n, total, out=np.zeros_like(delta), where=total > 0)
+            m2 = m2 + c_m2 + delta ** 2 * np.divide(n * c_n, total, out=np.zeros_like(delta), where=total > 0)
+            mins = np.minimum(mins, c_min)
+            maxs = np.maximum(maxs, c_max)
+            n = total
+    std = np.sqrt(np.divide(m2, n, out=np.zeros_like(m2), where=n > 0))
+    return mean, std, mins, maxs
+
+
 class Estimator(object):
     """
     Abstract class for any ML estimator.
@@ -29,6 +74,10 @@ class Estimator(object):
     Please see the tutorial for a detailed walk-through.
     """
 
+    # Single background worker shared by all estimators so checkpoint writes
+    # never interleave and never block the training loop.
+    _save_executor = None
+
     def __init__(self, features=None, n_hidden=(100,), activation="tanh", dropout_prob=0.0):
         self.features = features
         self.n_hidden = n_hidden
@@ -49,8 +98,13 @@ class Estimator(object):
         self.x_scaling_quantile_up = None
         self.x_scaling_quantile_down = None
 
+        self._pending_save = None
+        self._staging_sd = None
+        self._scaling_cache = {}
+        atexit.register(self.wait_for_checkpoint)
+
         self.divisions = 100 # binning for inputs if requested
-        
+
     def train(self, *args, **kwargs):
         raise NotImplementedError
 
@@ -93,44 +147,72 @@ class Estimator(object):
         # Check paths
         create_missing_folders([os.path.dirname(filename)])
 
-        # Save settings
-        logger.debug("Saving settings to %s_settings.json", filename)
+        # Make sure a previous checkpoint is fully on disk before snapshotting a new one
+        self.wait_for_checkpoint()
 
+        # Snapshot everything synchronously (cheap: a D2H copy at most), then hand
+        # the actual disk writes to a background thread so training is not blocked
+        # by slow or networked storage.
         settings = self._wrap_settings()
-        with open(filename + "_settings.json", "w") as f:
-            json.dump(settings, f)
-        # Save scaling
+        state_dict_cpu, copy_event = self._snapshot_state_dict()
+        scaling_arrays = {}
         if self.x_scaling_stds is not None and self.x_scaling_means is not None:
             logger.debug("Saving input scaling information to %s_x_means.npy and %s_x_stds.npy", filename, filename)
-            np.save(filename + "_x_means.npy", self.x_scaling_means)
-            np.save(filename + "_x_stds.npy", self.x_scaling_stds)
+            scaling_arrays["_x_means.npy"] = np.array(self.x_scaling_means)
+            scaling_arrays["_x_stds.npy"] = np.array(self.x_scaling_stds)
 
         if self.x_scaling_mins is not None and self.x_scaling_maxs is not None:
             logger.debug("Saving input scaling information to %s_x_mins.npy and %s_x_maxs.npy", filename, filename)
-            np.save(filename + "_x_mins.npy", self.x_scaling_mins)
-            np.save(filename + "_x_maxs.npy", self.x_scaling_maxs)
+            scaling_arrays["_x_mins.npy"] = np.array(self.x_scaling_mins)
+            scaling_arrays["_x_maxs.npy"] = np.array(self.x_scaling_maxs)
 
-        # Save state dict
-        logger.debug("Saving state dictionary to %s_state_dict.pt", filename)
-        torch.save(self.model.state_dict(), filename + "_state_dict.pt")
+        logger.debug("Saving settings and state dictionary to %s_* in the background", filename)
+        self._pending_save = self._get_save_executor().submit(
+            self._write_checkpoint, filename, settings, state_dict_cpu, scaling_arrays, copy_event
+        )
 
         # Save model
         if save_model:
             logger.debug("Saving model to %s_model.pt", filename)
-            torch.save(self.model, filename + "_model.pt")
-
-        # Export model to onnx
+            try:
+                # TorchScript archive: leaner and faster to load than pickling
+                # the full Python object tree
+                torch.jit.script(self.model).save(filename + "_model.pt")
+            except Exception:
+                logger.warning("Scripting model failed, falling back to torch.save for %s_model.pt", filename)
+                torch.save(self.model, filename + "_model.pt")
+
+        # Export model to onnx; the compute-bound trace runs on this thread
+        # while the background executor is still writing the state dict, so
+        # the two halves of the save overlap
         if export_model:
-            self.model.eval()
-            x = load_and_check(x)
-            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            dummy_input = torch.from_numpy(x[0].reshape(1, -1)).float().to(device)
-            torch.onnx.export(self.model, dummy_input,filename+".onnx", export_params=True, input_names = ['input'],output_names = ['r_hat', 's_hat'], verbose = True)
+            self.export_onnx(filename, x, metaData)
+
+        # Tar model if training is done on GPU
+        # tarfile in python is slow, so if noTar==True, skip this.
+        if torch.cuda.is_available() and not noTar:
+            self.wait_for_checkpoint()  # the tarball needs the files on disk
+            tar = tarfile.open("models_out.tar.gz", "w:gz")
+            for name in [filename+".onnx", filename + "_x_stds.npy", filename + "_x_means.npy",  filename + "_x_mins.npy",  filename + "_x_maxs.npy", filename + "_settings.json",  filename + "_state_dict.pt"]:
+                tar.add(name)
+            tar.close()
+
+    def export_onnx(self, filename, x, metaData):
+        """
+        Traces the model to <filename>.onnx and writes a copy with the
+        metaData key/value pairs embedded as custom ONNX metadata
+        (<filename>_new.onnx), verified through an onnxruntime session.
+        """
+        self.model.eval()
+        x = load_and_check(x)
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        dummy_input = torch.from_numpy(x[0].reshape(1, -1)).float().to(device)
+        torch.onnx.export(self.model, dummy_input,filename+".onnx", export_params=True, input_names = ['input'],output_names = ['r_hat', 's_hat'], verbose = True)
 
         # Manipulate onnx model using 'onnxruntime' module directly
         #  Note: This is inefficient due to I/O reasons, however
         #        torch.onnx interface seemingly has no options for this
-        if export_model and os.path.isfile(filename+".onnx"):
+        if os.path.isfile(filename+".onnx"):
 
             ####################################
             ##        ONNXRUNTIME
@@ -201,14 +283,90 @@ class Estimator(object):
             ####################################
             ###################################
 
+    @classmethod
+    def _get_save_executor(cls):
+        if Estimator._save_executor is None:
+            Estimator._save_executor = ThreadPoolExecutor(max_workers=1)
+        return Estimator._save_executor
 
-        # Tar model if training is done on GPU
-        # tarfile in python is slow, so if noTar==True, skip this.
-        if torch.cuda.is_available() and not noTar:
-            tar = tarfile.open("models_out.tar.gz", "w:gz")
-            for name in [filename+".onnx", filename + "_x_stds.npy", filename + "_x_means.npy",  filename + "_x_mins.npy",  filename + "_x_maxs.npy", filename + "_settings.json",  filename + "_state_dict.pt"]:
-                tar.add(name)
-            tar.close()
+    def _snapshot_state_dict(self):
+        """
+        Copies the model state dict into a persistent host staging buffer. The
+        buffer (the save "plan": keys, dtypes, shapes) is allocated on the first
+        save and reused by every subsequent intermediate save, so repeated
+        checkpoints only pay for raw byte copies. On CUDA the buffer is pinned and
+        the copies run on a dedicated stream, so the D2H transfer can overlap with
+        other work; the returned event is synchronized by the background writer
+        before torch.save.
+        """
+        state_dict = self.model.state_dict()
+        on_cuda = any(v.is_cuda for v in state_dict.values())
+
+        plan_stale = self._staging_sd is None or any(
+            k not in self._staging_sd or self._staging_sd[k].shape != v.shape or self._staging_sd[k].dtype != v.dtype
+            for k, v in state_dict.items()
+        )
+        if plan_stale:
+            self._staging_sd = {
+                k: torch.empty_like(v, device="cpu", pin_memory=on_cuda) for k, v in state_dict.items()
+            }
+
+        if not on_cuda:
+            for k, v in state_dict.items():
+                self._staging_sd[k].copy_(v.detach())
+            return self._staging_sd, None
+
+        copy_stream = torch.cuda.Stream()
+        copy_stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(copy_stream):
+            for k, v in state_dict.items():
+                self._staging_sd[k].copy_(v.detach(), non_blocking=True)
+            copy_event = torch.cuda.Event()
+            copy_event.record(copy_stream)
+        # Keep the default stream from mutating the parameters (optimizer.step
+        # after an intermediate save) before the copies have read them; this
+        # orders GPU work only, the host does not block
+        torch.cuda.current_stream().wait_event(copy_event)
+        return self._staging_sd, copy_event
+
+    @staticmethod
+    def _write_checkpoint(filename, settings, state_dict_cpu, scaling_arrays, copy_event=None):
+        # Runs on the background thread. Each file is written to a temporary path
+        # and moved into place with os.replace so readers never see a partial
+        # file; the individual files are flushed in parallel so the wall time is
+        # the slowest write instead of the sum (matters on networked storage).
+        def write_settings():
+            tmp = filename + "_settings.json.tmp"
+            with open(tmp, "wb") as f:
+                f.write(_dumps(settings))
+            os.replace(tmp, filename + "_settings.json")
+
+        def write_array(suffix, array):
+            tmp = filename + suffix + ".tmp.npy"  # np.save appends .npy if missing
+            np.save(tmp, array)
+            os.replace(tmp, filename + suffix)
+
+        def write_state_dict():
+            if copy_event is not None:
+                copy_event.synchronize()
+            tmp = filename + "_state_dict.pt.tmp"
+            torch.save(state_dict_cpu, tmp, _use_new_zipfile_serialization=True)
+            os.replace(tmp, filename + "_state_dict.pt")
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(write_settings), executor.submit(write_state_dict)]
+            futures += [executor.submit(write_array, suffix, array) for suffix, array in scaling_arrays.items()]
+            for future in futures:
+                future.result()
+
+    def wait_for_checkpoint(self):
+        """
+        Blocks until the last asynchronous `Estimator.save()` has finished writing to
+        disk, and re-raises any exception the background write hit.
+        """
+        if self._pending_save is not None:
+            self._pending_save.result()
+            self._pending_save = None
 
     def makeConfusion(self, filename, x,y):
         X = torch.from_numpy(x).type(torch.FloatTensor)
@@ -216,7 +374,7 @@ class Estimator(object):
         logger.info("acc %.2f",accuracy_score(y_pred,y))
         logger.info(confusion_matrix(y, y_pred))
 
-    def load(self, filename, global_name=None, nentries=-1):
+    def load(self, filename, global_name=None, nentries=-1, map_location=None):
 
         """
         Loads a trained model from files.
@@ -224,6 +382,9 @@ class Estimator(object):
         ----------
         filename : str
             Path to the files. '_settings.json' and '_state_dict.pl' will be added.
+        map_location : str or torch.device, optional
+            Device to load the state dict onto. Defaults to the device the model
+            lives on, avoiding a CPU round-trip for CUDA models.
         Returns
         -------
             None
@@ -231,6 +392,9 @@ class Estimator(object):
 
         logger.info("Loading model from %s", filename)
 
+        # An in-flight asynchronous save may still be writing these files
+        self.wait_for_checkpoint()
+
         # Load settings and create model
         logger.debug("Loading settings from %s_settings.json", filename)
         with open(filename + "_settings.json", "r") as f:
@@ -257,13 +421,19 @@ class Estimator(object):
                 self.initialize_input_transform(x=None, overwrite=False, 
                                                 metaData=metaDataDict, scaling=self.scaling_method)
             else:
-                self.x_scaling_means = np.load(filename + "_x_means.npy")
-                self.x_scaling_stds =  np.load(filename + "_x_stds.npy")
-                self.x_scaling_mins =  np.load(filename + "_x_mins.npy")
-                self.x_scaling_maxs =  np.load(filename + "_x_maxs.npy")
+                self._scaling_cache = {}
+                # mmap the scaling constants: zero-copy, paged in on first use
+                self.x_scaling_means = np.load(filename + "_x_means.npy", mmap_mode="r")
+                self.x_scaling_stds =  np.load(filename + "_x_stds.npy", mmap_mode="r")
+                self.x_scaling_mins =  np.load(filename + "_x_mins.npy", mmap_mode="r")
+                self.x_scaling_maxs =  np.load(filename + "_x_maxs.npy", mmap_mode="r")
                 logger.debug(
                     "  Found input scaling information: means %s, stds %s, mins %s, maxs %s  ", self.x_scaling_means, self.x_scaling_stds, self.x_scaling_mins, self.x_scaling_maxs
                 )
+                # Warm the scaling-constant cache so the first minibatch does not
+                # pay for the reciprocal computation
+                if self.scaling_method in ("standard", "minmax"):
+                    self._get_scaling_constants(self.scaling_method)
         except FileNotFoundError:
             logger.warning("Scaling information not found in %s", filename)
             self.x_scaling_means = None
@@ -271,14 +441,62 @@ class Estimator(object):
             self.x_scaling_mins = None
             self.x_scaling_maxs = None
 
+        self._register_scaling_buffers()
+
         # Load state dict
         logger.debug("Loading state dictionary from %s_state_dict.pt", filename)
-        self.model.load_state_dict(torch.load(filename + "_state_dict.pt", map_location="cpu")) # Likely an issue when in/on GPU mode/node
+        if map_location is None:
+            # Load straight onto the model's device instead of staging through CPU
+            map_location = next(self.model.parameters()).device
+        try:
+            # mmap + weights_only skips eager deserialization and pages tensors in lazily
+            state_dict = torch.load(filename + "_state_dict.pt", map_location=map_location, mmap=True, weights_only=True)
+        except (TypeError, RuntimeError, pickle.UnpicklingError):
+            # Older torch versions (< 2.1) or legacy checkpoint formats
+            state_dict = torch.load(filename + "_state_dict.pt", map_location=map_location)
+        self.model.load_state_dict(state_dict)
+
+    def _load_scaler_stats(self, scaler_path):
+        """ Returns the persisted scaling statistics as a dict, or None. """
+        if scaler_path is None or not os.path.exists(scaler_path):
+            return None
+        logger.info("Loading input scaling constants from %s", scaler_path)
+        try:
+            with np.load(scaler_path) as f:
+                return {key: f[key] for key in f.files}
+        except Exception:
+            logger.warning("Could not read scaling constants from %s, recomputing them", scaler_path)
+            return None
+
+    def _save_scaler_stats(self, scaler_path):
+        if scaler_path is None:
+            return
+        # Under torchrun every rank computes the same statistics; only the
+        # main rank writes them
+        if torch.distributed.is_available() and torch.distributed.is_initialized() \
+                and torch.distributed.get_rank() != 0:
+            return
+        stats = {
+            "means": self.x_scaling_means,
+            "stds": self.x_scaling_stds,
+            "mins": self.x_scaling_mins,
+            "maxs": self.x_scaling_maxs,
+            "quantile_down": self.x_scaling_quantile_down,
+            "quantile_up": self.x_scaling_quantile_up,
+        }
+        logger.info("Saving input scaling constants to %s", scaler_path)
+        tmp = scaler_path + ".tmp.npz"  # np.savez appends .npz if missing
+        np.savez(tmp, **{key: value for key, value in stats.items() if value is not None})
+        os.replace(tmp, scaler_path)
+
+    def initialize_input_transform(self, x,
+                                   transform=True, overwrite=True,
+                                   metaData = None, scaling="minmax",
+                                   scaler_path=None):
+
+        # Scaling constants may change below, drop any cached tensors
+        self._scaling_cache = {}
 
-    def initialize_input_transform(self, x, 
-                                   transform=True, overwrite=True, 
-                                   metaData = None, scaling="minmax"):
-        
         # Initially tell the user if values already set
         if (self.x_scaling_stds is not None  and
            self.x_scaling_means is not None and 
@@ -315,8 +533,14 @@ class Estimator(object):
 
             # Add the quantiles as it does not hurt at this stage
             if x is not None:
-                self.x_scaling_quantile_down = np.quantile(x, 0, axis=0)
-                self.x_scaling_quantile_up = np.quantile(x, 0.80, axis=0)
+                stats = self._load_scaler_stats(scaler_path)
+                if stats is not None and "quantile_down" in stats and "quantile_up" in stats:
+                    self.x_scaling_quantile_down = stats["quantile_down"]
+                    self.x_scaling_quantile_up = stats["quantile_up"]
+                else:
+                    self.x_scaling_quantile_down = np.quantile(x, 0, axis=0)
+                    self.x_scaling_quantile_up = np.quantile(x, 0.80, axis=0)
+                    self._save_scaler_stats(scaler_path)
                 if self.clamp_max is None:
                     self.clamp_max = self.x_scaling_quantile_up
                     if self.clamp_min is None:
@@ -324,13 +548,36 @@ class Estimator(object):
                         
         elif transform and metaData is None:
             logger.info("Setting up input rescaling")
-            self.x_scaling_means = np.nanmean(x, axis=0)
-            self.x_scaling_stds = np.maximum(np.nanstd(x, axis=0), 1.0e-6)
-            self.x_scaling_mins = np.nanmin(x, axis=0)
-            self.x_scaling_maxs = np.nanmax(x, axis=0)
-
-            self.x_scaling_quantile_down = np.quantile(x, 0, axis=0)
-            self.x_scaling_quantile_up = np.quantile(x, 0.80, axis=0)
+            stats = self._load_scaler_stats(scaler_path)
+            if stats is not None and all(
+                key in stats for key in ("means", "stds", "mins", "maxs", "quantile_down", "quantile_up")
+            ):
+                # Reuse the persisted statistics instead of re-scanning x
+                self.x_scaling_means = stats["means"]
+                self.x_scaling_stds = stats["stds"]
+                self.x_scaling_mins = stats["mins"]
+                self.x_scaling_maxs = stats["maxs"]
+                self.x_scaling_quantile_down = stats["quantile_down"]
+                self.x_scaling_quantile_up = stats["quantile_up"]
+            else:
+                # One fused pass for mean/std/min/max instead of four separate
+                # full-array reductions; for memmaps the resident set stays bounded
+                # at one tile
+                means, stds, mins, maxs = _streaming_moments(x)
+                self.x_scaling_means = means
+                self.x_scaling_stds = np.maximum(stds, 1.0e-6)
+                self.x_scaling_mins = mins
+                self.x_scaling_maxs = maxs
+
+                if isinstance(x, np.memmap):
+                    self.x_scaling_quantile_down = mins
+                    # Upper quantile from a row subsample bounded by one tile
+                    stride = max(1, x.shape[0] // MEMMAP_CHUNK_SIZE)
+                    self.x_scaling_quantile_up = np.quantile(np.asarray(x[::stride]), 0.80, axis=0)
+                else:
+                    self.x_scaling_quantile_down = np.quantile(x, 0, axis=0)
+                    self.x_scaling_quantile_up = np.quantile(x, 0.80, axis=0)
+                self._save_scaler_stats(scaler_path)
             if self.clamp_max is None:
                 self.clamp_max = self.x_scaling_quantile_up
             if self.clamp_min is None:
@@ -346,6 +593,8 @@ class Estimator(object):
             self.x_scaling_quantile_down = np.zeros(n_parameters)
             self.x_scaling_quantile_up = np.ones(n_parameters)
 
+        self._register_scaling_buffers()
+
     def _clamp_inputs(self, x):
         logger.info("<base.py::_transform_inputs()>::   Doing Clamping for inputs")
         # clamp value by 25% to 75% quntile
@@ -358,6 +607,77 @@ class Estimator(object):
             clamp_min = self.clamp_min
             return np.clip(x, clamp_min, clamp_max)
 
+    def _get_scaling_constants(self, scaling, dtype=None, device=None):
+        """
+        Returns the cached `(shift, inverse_scale)` pair for the requested scaling,
+        as torch tensors when `dtype`/`device` are given (one H2D copy per
+        (dtype, device), not one per minibatch), precomputing the reciprocal so
+        the hot path is a single subtract-multiply.
+        """
+        key = (scaling, dtype, device)
+        cached = self._scaling_cache.get(key)
+        if cached is None:
+            if scaling == "standard":
+                shift = np.asarray(self.x_scaling_means)
+                inv_scale = 1.0 / np.asarray(self.x_scaling_stds)
+            else:
+                shift = np.asarray(self.x_scaling_mins)
+                diff = np.asarray(self.x_scaling_maxs) - shift
+                with np.errstate(divide="ignore"):
+                    inv_scale = np.where(diff != 0, 1.0 / diff, 0.0)
+            if dtype is not None:
+                shift = torch.as_tensor(shift, dtype=dtype, device=device)
+                inv_scale = torch.as_tensor(inv_scale, dtype=dtype, device=device)
+            cached = (shift, inv_scale)
+            self._scaling_cache[key] = cached
+        return cached
+
+    def _torch_scaling_constants(self, x, scaling):
+        # Prefer the buffers registered on the model: they already live on the
+        # model's device and move with it, so no per-call copy is needed
+        shift = getattr(self.model, "x_shift", None) if self.model is not None else None
+        if shift is not None and shift.device == x.device and (self.scaling_method or "minmax") == scaling:
+            return shift.to(x.dtype), self.model.x_inv_scale.to(x.dtype)
+        return self._get_scaling_constants(scaling, x.dtype, x.device)
+
+    def _register_scaling_buffers(self):
+        """
+        Attaches the active scaling constants to the model as non-persistent
+        buffers, so they follow the model across `.to(device)` moves and the hot
+        transform path reuses them without re-allocation. The npy sidecar files
+        remain the on-disk source of truth, keeping old checkpoints loadable.
+        """
+        if self.model is None:
+            return
+        scaling = self.scaling_method or "minmax"
+        if scaling == "standard":
+            if self.x_scaling_means is None or self.x_scaling_stds is None:
+                return
+        elif self.x_scaling_mins is None or self.x_scaling_maxs is None:
+            return
+        shift, inv_scale = self._get_scaling_constants(scaling)
+        device = next(self.model.parameters()).device
+        self.model.register_buffer(
+            "x_shift", torch.as_tensor(shift, dtype=torch.float, device=device), persistent=False
+        )
+        self.model.register_buffer(
+            "x_inv_scale", torch.as_tensor(inv_scale, dtype=torch.float, device=device), persistent=False
+        )
+
+    @staticmethod
+    def _transform_memmap(x, shift, inv_scale):
+        # Stream the transform over row tiles and write back into the map, so
+        # peak memory stays at one tile rather than a full in-memory copy
+        for i in range(0, x.shape[0], MEMMAP_CHUNK_SIZE):
+            buf = x[i : i + MEMMAP_CHUNK_SIZE]
+            buf -= shift
+            buf *= inv_scale
+            np.nan_to_num(buf, copy=False, nan=-1.0, posinf=0.0, neginf=0.0)
+            x[i : i + MEMMAP_CHUNK_SIZE] = buf
+        if hasattr(x, "flush") and getattr(x, "mode", "c") in ("r+", "w+"):
+            x.flush()
+        return x
+
     def _transform_inputs(self, x, scaling = "minmax"):
         # use the self.scaling method to overwritten the scaling arugmuent
         # i.e if self.scaling_method = None, scaling will be used.
@@ -367,17 +687,17 @@ class Estimator(object):
             if self.x_scaling_means is not None and self.x_scaling_stds is not None:
                 logger.info("Doing Standard Scaling")
                 if isinstance(x, torch.Tensor):
-                    x_scaled = x - torch.tensor(self.x_scaling_means, dtype=x.dtype, device=x.device)
-                    x_scaled = x_scaled / torch.tensor(self.x_scaling_stds, dtype=x.dtype, device=x.device)
+                    shift, inv_scale = self._torch_scaling_constants(x, scaling)
+                elif isinstance(x, np.memmap):
+                    shift, inv_scale = self._get_scaling_constants(scaling)
+                    return self._transform_memmap(x, shift, inv_scale)
                 else:
-                    x_scaled = x - self.x_scaling_means
-                    x_scaled /= self.x_scaling_stds
-                
+                    shift, inv_scale = self._get_scaling_constants(scaling)
+                x_scaled = (x - shift) * inv_scale
+
                 # Check for nans/nums
                 # -1 might not be best option if this is a valid value for a feature. Best option is to set to -10% of range below min or above max
-                x_scaled = np.nan_to_num(x_scaled, nan=-1.0, posinf=0.0, neginf=0.0) 
-                #x_scaled = torch.tensor(np.nan_to_num(x_scaled, nan=-1.0, posinf=0.0, neginf=0.0), dtype=x.dtype, device=x.device )  # For GPU shenanigans
-                #x_scaled = torch.tensor(x_scaled, dtype=x_scaled.dtype, device=x.device)
+                x_scaled = np.nan_to_num(x_scaled, nan=-1.0, posinf=0.0, neginf=0.0)
             else:
                 logger.info("Unable to do standard scaling")
                 x_scaled = x
@@ -390,19 +710,20 @@ class Estimator(object):
                 if self.scaling_clamp:
                     x = self._clamp_inputs(x)
                 if isinstance(x, torch.Tensor):
-                    x_scaled = (x-torch.tensor(self.x_scaling_mins, dtype=x.dtype, device=x.device))
-                    x_scaled = x_scaled/(torch.tensor(self.x_scaling_maxs, dtype=x.dtype, device=x.device) - torch.tensor(self.x_scaling_mins, dtype=x.dtype, device=x.device))
+                    shift, inv_scale = self._torch_scaling_constants(x, scaling)
+                elif isinstance(x, np.memmap) and not self.scaling_clamp:
+                    shift, inv_scale = self._get_scaling_constants(scaling)
+                    return self._transform_memmap(x, shift, inv_scale)
                 else:
-                    x_scaled = (x - self.x_scaling_mins)
-                    #x_scaled = x_scaled/(self.x_scaling_maxs - self.x_scaling_mins)
-                    diff = (self.x_scaling_maxs - self.x_scaling_mins)
-                    x_scaled = np.divide(x_scaled, diff, out=np.zeros_like(x_scaled), where=diff!=0)
+                    shift, inv_scale = self._get_scaling_constants(scaling)
+                # Features with zero range get inv_scale 0 and end up at 0
+                x_scaled = (x - shift) * inv_scale
             else:
                 logger.info("Unable to do min-max scaling")
                 x_scaled = x
             # Check for nans/nums and assigning dummy values
             # -1 might not be best option if this is a valid value for a feature. Best option is to set to -10% of range below min or above max
-            x_scaled = np.nan_to_num(x_scaled, nan=-1.0, posinf=0.0, neginf=0.0) 
+            x_scaled = np.nan_to_num(x_scaled, nan=-1.0, posinf=0.0, neginf=0.0)
 
         return x_scaled
 
@@ -427,13 +748,13 @@ class Estimator(object):
             )
 
         self.n_observables = int(settings["n_observables"])
-        self.n_hidden = tuple([int(item) for item in settings["n_hidden"]])
+        self.n_hidden = tuple(map(int, settings["n_hidden"]))
         self.activation = str(settings["activation"])
         self.features = settings["features"]
         if self.features == "None":
             self.features = None
         if self.features is not None:
-            self.features = list([int(item) for item in self.features])
+            self.features = list(map(int, self.features))
 
         try:
             self.dropout_prob = float(settings["dropout_prob"])
@@ -2,7 +2,6 @@ from __future__ import absolute_import, division, print_function
 
 import os
 import pickle
-from collections import defaultdict
 from .utils.plotting import draw_weighted_distributions
 
 import logging
@@ -71,6 +70,7 @@ class RatioEstimator(Estimator):
         verbose="some",
         scale_parameters=False,
         n_workers=4,
+        prefetch_factor=2,
         clip_gradient=None,
         early_stopping_patience=None,
         intermediate_train_plot=None,
@@ -79,6 +79,12 @@ class RatioEstimator(Estimator):
         plot_inputs=False,
         nentries=-1,
         loss_type="regular",
+        torch_compile=False,
+        jit_script=False,
+        amp="off",
+        gpu_dataset=False,
+        scaler_path=None,
+        metaData=None,
     ):
 
         """
@@ -176,19 +182,23 @@ class RatioEstimator(Estimator):
         if scale_inputs:
 
             # Check if meta data has been saved, if so then scale using saved meta data from
-            # initial total dataset loading stage
-            metaData='data/'+global_name+'/metaData_'+str(nentries)+'.pkl'
-            metaDataDict = None
-            if os.path.exists(metaData):
-                # Get the meta data containing the keys (input feature names)
-                logger.info("Obtaining input features from metaData_{}.pkl".format(global_name))
-                metaDataFile = open(metaData, 'rb')
-                metaDataDict = pickle.load(metaDataFile)
-                metaDataFile.close()
+            # initial total dataset loading stage. Callers that already hold the
+            # dict pass it in directly, which also avoids racing the Loader's
+            # background write of the pickle
+            metaDataDict = metaData
+            if metaDataDict is None:
+                metaDataPath = 'data/'+global_name+'/metaData_'+str(nentries)+'.pkl'
+                if os.path.exists(metaDataPath):
+                    # Get the meta data containing the keys (input feature names)
+                    logger.info("Obtaining input features from metaData_{}.pkl".format(global_name))
+                    metaDataFile = open(metaDataPath, 'rb')
+                    metaDataDict = pickle.load(metaDataFile)
+                    metaDataFile.close()
 
             # Initialise input scaling transformation
-            self.initialize_input_transform(x, overwrite=False, 
-                                            metaData=metaDataDict, scaling=scaling)
+            self.initialize_input_transform(x, overwrite=False,
+                                            metaData=metaDataDict, scaling=scaling,
+                                            scaler_path=scaler_path)
 
             # Call the transformation
             x = self._transform_inputs(x)
@@ -198,26 +208,31 @@ class RatioEstimator(Estimator):
             # If requested by user then transformed inputs are plotted
             if plot_inputs:
                 logger.info("Plotting transformed input features for {}".format(global_name))
-                if os.path.exists(metaData):
-                    # Transform the input data for x0, and x1
-                    x0 = self._transform_inputs(x0)
-                    x1 = self._transform_inputs(x1)
-
-                    # Determine binning, and store in dicts
-                    binning = defaultdict()
-                    minmax = defaultdict()
-                    for idx,(key,pair) in enumerate(metaDataDict.items()):
-                        #  Integers values indicate well bounded data, so use full range
-                        intTest = [ (i % 1) == 0  for i in x0[:,idx] ]
-                        intTest = all(intTest) #np.all(intTest == True)
-                        upperThreshold = 100 if intTest else 98
-                        max = np.percentile(x0[:,idx], upperThreshold)
-                        lowerThreshold = 0 if (np.any(x0[:,idx] < 0 ) or intTest) else 0
-                        min = np.percentile(x0[:,idx], lowerThreshold)
-                        minmax[idx] = [min,max]
-                        binning[idx] = np.linspace(min, max, self.divisions)
+                if metaDataDict is not None:
+                    # x has already been transformed above. When the canonical
+                    # [x0; x1] stacking is intact we can just slice its rows for
+                    # plotting instead of normalizing x0 and x1 a second time.
+                    n0 = x0.shape[0]
+                    if x.shape[0] == n0 + x1.shape[0] and np.all(y[:n0] == 0) and np.all(y[n0:] == 1):
+                        x0 = x[:n0]
+                        x1 = x[n0:]
+                    else:
+                        # Transform the input data for x0, and x1
+                        x0 = self._transform_inputs(x0)
+                        x1 = self._transform_inputs(x1)
+
+                    # Determine binning, stored as contiguous (D, ...) arrays
+                    n_plot = len(metaDataDict)
+                    #  Integer-valued columns indicate well bounded data, so use full range;
+                    #  vectorized over all columns at once instead of per-feature Python loops
+                    int_cols = np.all(np.equal(x0[:, :n_plot], np.trunc(x0[:, :n_plot])), axis=0)
+                    mins, p98, p100 = np.percentile(x0[:, :n_plot], [0.0, 98.0, 100.0], axis=0)
+                    maxs = np.where(int_cols, p100, p98)
+                    minmax = np.stack([mins, maxs], axis=1)
+                    binning = np.linspace(mins, maxs, self.divisions, axis=-1)
+                    for idx, key in enumerate(metaDataDict.keys()):
                         logger.info("Column {}:  min  =  {},  max  =  {}"
-                              .format(key,min,max))
+                              .format(key, mins[idx], maxs[idx]))
 
                     # Now draw the input distributions
                     draw_weighted_distributions(x0, x1, 
@@ -262,6 +277,31 @@ class RatioEstimator(Estimator):
         if self.model is None:
             logger.info("Creating model")
             self._create_model()
+
+        # Optionally compile: for a small MLP the per-op Python dispatch is the
+        # hot path, so a fused compiled graph cuts per-step overhead
+        # Only the trainer sees a wrapped model; self.model stays the eager
+        # module (the wrappers share its parameter tensors), so intermediate
+        # and final saves both snapshot plain state-dict keys
+        compiled = False
+        train_model = self.model
+        if torch_compile and hasattr(torch, "compile"):
+            logger.info("Compiling model with torch.compile")
+            try:
+                train_model = torch.compile(self.model, mode="reduce-overhead")
+                compiled = True
+            except Exception:
+                logger.warning("torch.compile failed, continuing with the eager model")
+        elif jit_script:
+            # TorchScript specialises the forward for the fixed layer sizes
+            # without torch.compile's warm-up cost. The script module must not
+            # become self.model: its state_dict would also serialize the
+            # non-persistent scaling buffers, breaking load() on checkpoints
+            logger.info("Scripting model with torch.jit.script")
+            try:
+                train_model = torch.jit.script(self.model)
+            except Exception:
+                logger.warning("torch.jit.script failed, continuing with the eager model")
         # Losses
         if w is None:
             w = len(x0)/len(x1)
@@ -277,7 +317,10 @@ class RatioEstimator(Estimator):
 
         # Train model
         logger.info("Training model")
-        trainer = RatioTrainer(self.model, n_workers=n_workers)
+        # Compiled graphs want every batch the same shape, so the final
+        # partial batch is dropped when training a compiled model
+        trainer = RatioTrainer(train_model, n_workers=n_workers, prefetch_factor=prefetch_factor, amp=amp,
+                               drop_last=compiled, gpu_dataset=gpu_dataset)
         result = trainer.train(
             data=data,
             data_val=data_val,
@@ -299,6 +342,7 @@ class RatioEstimator(Estimator):
             intermediate_train_plot = intermediate_train_plot,
             intermediate_save = intermediate_save,
         )
+
         return result
 
     def evaluate_ratio(self, x):
@@ -373,12 +417,32 @@ class RatioEstimator(Estimator):
             activation=self.activation,
             dropout_prob=self.dropout_prob,
         )
+        self._register_scaling_buffers()
     @staticmethod
     def _package_training_data(method, x, y, w): #sjiggins
+        """
+        Packages the training arrays for the trainer. Plain ndarrays are converted
+        to contiguous float32 torch tensors once here (zero-copy via
+        torch.from_numpy, pinned when CUDA is available) so the dataset/dataloader
+        neither re-converts nor re-casts per epoch; memmaps are passed through
+        untouched for lazy per-batch reads.
+        """
+        if w is None:
+            # The loss treats a missing weight as unity; materialize that here so
+            # the dataset can batch it like any other column
+            w = np.ones((y.shape[0], 1), dtype=np.float32)
+        pin = torch.cuda.is_available()
+        downcast = False
         data = OrderedDict()
-        data["x"] = x
-        data["y"] = y
-        data["w"] = w #sjiggins
+        for key, value in (("x", x), ("y", y), ("w", w)):
+            if isinstance(value, np.ndarray) and not isinstance(value, np.memmap):
+                downcast = downcast or value.dtype == np.float64
+                value = torch.from_numpy(np.ascontiguousarray(value, dtype=np.float32))
+                if pin:
+                    value = value.pin_memory()
+            data[key] = value
+        if downcast:
+            logger.info("Downcasting float64 training arrays to float32 for training")
         return data
 
     def _wrap_settings(self):
@@ -1,14 +1,17 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import os
 import six
 import logging
+import contextlib
 from collections import OrderedDict
 import numpy as np
 import time
 import torch
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
-from torch.utils.data.sampler import SubsetRandomSampler
+from torch.utils.data import Dataset, DataLoader, Subset
+from torch.utils.data.distributed import DistributedSampler
+from torch.utils.data.sampler import BatchSampler, RandomSampler, SubsetRandomSampler
 from torch.nn.utils import clip_grad_norm_
 from sklearn.metrics import accuracy_score
 logger = logging.getLogger(__name__)
@@ -45,6 +48,10 @@ class NumpyDataset(Dataset):
             if isinstance(array, np.memmap):
                 self.memmap.append(True)
                 self.data.append(array)
+            elif isinstance(array, torch.Tensor):
+                # Already converted (and possibly pinned) upstream
+                self.memmap.append(False)
+                self.data.append(array.to(self.dtype))
             else:
                 self.memmap.append(False)
                 # https://discuss.pytorch.org/t/cuda-initialization-error-when-dataloader-with-cuda-tensor/43390
@@ -52,6 +59,12 @@ class NumpyDataset(Dataset):
                 tensor = torch.from_numpy(array).to(self.dtype)
                 self.data.append(tensor)
 
+        # If every column already sits in pinned host memory the DataLoader
+        # does not need to pin batches a second time
+        self.pinned = not any(self.memmap) and all(t.is_pinned() for t in self.data)
+        # Set when the tensors have been moved to the GPU wholesale
+        self.on_device = False
+
     def __getitem__(self, index):
         items = []
         for memmap, array in zip(self.memmap, self.data):
@@ -74,16 +87,39 @@ class NumpyDataset(Dataset):
 class Trainer(object):
     """ Trainer class. Any subclass has to implement the forward_pass() function. """
 
-    def __init__(self, model, run_on_gpu=True, double_precision=False, n_workers=4):
+    def __init__(self, model, run_on_gpu=True, double_precision=False, n_workers=4, prefetch_factor=2, amp="off", drop_last=False, gpu_dataset=False):
         self._init_timer()
         self._timer(start="ALL")
         self._timer(start="initialize model")
         self.model = model
+        # Dropping the final partial batch keeps every step shape-stable,
+        # which CUDA-graph capture (torch.compile reduce-overhead) requires
+        self.drop_last = drop_last
+        self.gpu_dataset = gpu_dataset
         self.run_on_gpu = run_on_gpu and torch.cuda.is_available()
         self.device = torch.device("cuda" if self.run_on_gpu else "cpu")
+        # Under torchrun each process trains on its own data shard and card;
+        # gradients are kept in sync by DistributedDataParallel
+        self.distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+        if self.distributed and self.run_on_gpu:
+            self.device = torch.device("cuda", int(os.environ.get("LOCAL_RANK", 0)))
         self.dtype = torch.double if double_precision else torch.float
         self.n_workers = n_workers
+        self.prefetch_factor = prefetch_factor
+
+        # Mixed precision: autocast the model forward in bf16/fp16; fp16
+        # additionally needs gradient scaling and is CUDA-only
+        if amp == "fp16" and not self.run_on_gpu:
+            logger.warning("fp16 autocast requires CUDA, disabling mixed precision")
+            amp = "off"
+        self.amp_dtype = {"bf16": torch.bfloat16, "fp16": torch.float16}.get(amp)
+        self.grad_scaler = torch.cuda.amp.GradScaler() if amp == "fp16" else None
+
         self.model = self.model.to(self.device, self.dtype)
+        if self.distributed:
+            self.model = torch.nn.parallel.DistributedDataParallel(
+                self.model, device_ids=[self.device.index] if self.run_on_gpu else None
+            )
 
         logger.info(
             "Training on %s with %s precision",
@@ -177,6 +213,10 @@ class Trainer(object):
             self._timer(stop="set lr")
             loss_val = None
 
+            # DistributedSampler reshuffles per epoch only when told the epoch
+            if self.distributed and hasattr(train_loader.sampler, "set_epoch"):
+                train_loader.sampler.set_epoch(i_epoch)
+
             try:
                 loss_train, loss_val, loss_contributions_train, loss_contributions_val, accu_train, accu_val = self.epoch(
                     i_epoch, data_labels, train_loader, val_loader, opt, loss_functions, loss_weights, clip_gradient
@@ -285,52 +325,94 @@ class Trainer(object):
             data_labels.append(key)
             data_arrays.append(value)
         dataset = NumpyDataset(*data_arrays, dtype=self.dtype, device=self.device)#, run_on_gpu=self.run_on_gpu)
+
+        # Small datasets can live in VRAM outright: one upfront H2D copy
+        # instead of one per batch, and no loader workers at all
+        if self.gpu_dataset and self.run_on_gpu and not self.distributed and not any(dataset.memmap):
+            total_bytes = sum(t.element_size() * t.nelement() for t in dataset.data)
+            free_bytes = torch.cuda.mem_get_info(self.device)[0]
+            if 2 * total_bytes < free_bytes:
+                logger.info("Keeping the full dataset (%.1f MB) on %s", total_bytes / 1024 ** 2, self.device)
+                dataset.data = [t.to(self.device) for t in dataset.data]
+                dataset.pinned = False
+                dataset.on_device = True
+            else:
+                logger.warning(
+                    "Dataset (%.1f MB) too large for free VRAM (%.1f MB), streaming from host instead",
+                    total_bytes / 1024 ** 2, free_bytes / 1024 ** 2,
+                )
         return data_labels, dataset
 
     def make_dataloaders(self, dataset, dataset_val, validation_split, batch_size):
-        if dataset_val is None and (validation_split is None or validation_split <= 0.0):
-            train_loader = DataLoader(
-                dataset, batch_size=batch_size, shuffle=True, pin_memory=self.run_on_gpu, num_workers=self.n_workers
-                #dataset, batch_size=batch_size, shuffle=True, num_workers=0
-            )
+        # Skip per-batch pinning when the dataset tensors are pinned already
+        pin_memory = self.run_on_gpu and not getattr(dataset, "pinned", False)
+        loader_kwargs = {"batch_size": batch_size, "pin_memory": pin_memory, "num_workers": self.n_workers}
+        if self.n_workers > 0:
+            # Keep workers alive between epochs and prefetch batches ahead of
+            # the training loop so host-side loading overlaps compute
+            loader_kwargs["persistent_workers"] = True
+            loader_kwargs["prefetch_factor"] = self.prefetch_factor
+        # Only the training loader drops the final partial batch; a small
+        # validation split could otherwise end up with no batches at all
+        val_kwargs = loader_kwargs
+        loader_kwargs = dict(loader_kwargs, drop_last=self.drop_last)
+
+        if getattr(dataset, "on_device", False):
+            # Tensors already sit in VRAM: batches of indices are sliced
+            # on-device in a single indexing op, with no workers or pinning
+            def batched(ds, sampler, drop_last):
+                return DataLoader(ds, batch_size=None, sampler=BatchSampler(sampler, batch_size, drop_last))
+
+            if dataset_val is None and (validation_split is None or validation_split <= 0.0):
+                train_loader = batched(dataset, RandomSampler(dataset), self.drop_last)
+                val_loader = None
+            elif dataset_val is not None:
+                train_loader = batched(dataset, RandomSampler(dataset), self.drop_last)
+                val_loader = batched(dataset_val, RandomSampler(dataset_val), False)
+            else:
+                assert 0.0 < validation_split < 1.0, "Wrong validation split: {}".format(validation_split)
+                indices = np.random.default_rng().permutation(len(dataset))
+                split = int(np.floor(validation_split * len(dataset)))
+                train_loader = batched(dataset, SubsetRandomSampler(indices[split:]), self.drop_last)
+                val_loader = batched(dataset, SubsetRandomSampler(indices[:split]), False)
+            return train_loader, val_loader
+
+        if self.distributed:
+            # Every rank derives the same train/val split (fixed seed), then
+            # a DistributedSampler hands each rank its shard of it
+            if dataset_val is None and validation_split is not None and 0.0 < validation_split < 1.0:
+                indices = np.random.default_rng(42).permutation(len(dataset))
+                split = int(np.floor(validation_split * len(dataset)))
+                dataset_val = Subset(dataset, indices[:split].tolist())
+                dataset = Subset(dataset, indices[split:].tolist())
+            train_loader = DataLoader(dataset, sampler=DistributedSampler(dataset, shuffle=True), **loader_kwargs)
+            val_loader = None
+            if dataset_val is not None:
+                val_loader = DataLoader(dataset_val, sampler=DistributedSampler(dataset_val, shuffle=False), **val_kwargs)
+
+        elif dataset_val is None and (validation_split is None or validation_split <= 0.0):
+            train_loader = DataLoader(dataset, shuffle=True, **loader_kwargs)
             val_loader = None
 
         elif dataset_val is not None:
-            train_loader = DataLoader(
-                dataset, batch_size=batch_size, shuffle=True, pin_memory=self.run_on_gpu, num_workers=self.n_workers
-                #dataset, batch_size=batch_size, shuffle=True, num_workers=0
-            )
-            val_loader = DataLoader(
-                dataset_val, batch_size=batch_size, shuffle=True, pin_memory=self.run_on_gpu, num_workers=self.n_workers
-                #dataset_val, batch_size=batch_size, shuffle=True, num_workers=0
-            )
+            train_loader = DataLoader(dataset, shuffle=True, **loader_kwargs)
+            val_loader = DataLoader(dataset_val, shuffle=True, **val_kwargs)
 
         else:
             assert 0.0 < validation_split < 1.0, "Wrong validation split: {}".format(validation_split)
 
             n_samples = len(dataset)
-            indices = list(range(n_samples))
+            # PCG64 generator: a much faster shuffle than the legacy
+            # RandomState global used by np.random.shuffle
+            indices = np.random.default_rng().permutation(n_samples)
             split = int(np.floor(validation_split * n_samples))
-            np.random.shuffle(indices)
             train_idx, valid_idx = indices[split:], indices[:split]
 
             train_sampler = SubsetRandomSampler(train_idx)
             val_sampler = SubsetRandomSampler(valid_idx)
 
-            train_loader = DataLoader(
-                dataset,
-                sampler=train_sampler,
-                batch_size=batch_size,
-                pin_memory=self.run_on_gpu,
-                #num_workers=0#self.n_workers,
-            )
-            val_loader = DataLoader(
-                dataset,
-                sampler=val_sampler,
-                batch_size=batch_size,
-                pin_memory=self.run_on_gpu,
-                #num_workers=0#self.n_workers,
-            )
+            train_loader = DataLoader(dataset, sampler=train_sampler, **loader_kwargs)
+            val_loader = DataLoader(dataset, sampler=val_sampler, **val_kwargs)
 
         return train_loader, val_loader
 
@@ -457,6 +539,12 @@ class Trainer(object):
         """
         raise NotImplementedError
 
+    def _autocast(self):
+        """ Autocast context for the model forward, or a no-op when amp is off. """
+        if self.amp_dtype is None:
+            return contextlib.nullcontext()
+        return torch.autocast(device_type=self.device.type, dtype=self.amp_dtype)
+
     @staticmethod
     def sum_losses(contributions, weights):
         loss = weights[0] * contributions[0]
@@ -469,12 +557,22 @@ class Trainer(object):
         self._timer(start="opt: zero grad")
         optimizer.zero_grad()
         self._timer(stop="opt: zero grad", start="opt: backward")
-        loss.backward()
-        self._timer(start="opt: clip grad norm", stop="opt: backward")
-        if clip_gradient is not None:
-            clip_grad_norm_(self.model.parameters(), clip_gradient)
-        self._timer(stop="opt: clip grad norm", start="opt: step")
-        optimizer.step()
+        if self.grad_scaler is not None:
+            self.grad_scaler.scale(loss).backward()
+            self._timer(start="opt: clip grad norm", stop="opt: backward")
+            if clip_gradient is not None:
+                self.grad_scaler.unscale_(optimizer)
+                clip_grad_norm_(self.model.parameters(), clip_gradient)
+            self._timer(stop="opt: clip grad norm", start="opt: step")
+            self.grad_scaler.step(optimizer)
+            self.grad_scaler.update()
+        else:
+            loss.backward()
+            self._timer(start="opt: clip grad norm", stop="opt: backward")
+            if clip_gradient is not None:
+                clip_grad_norm_(self.model.parameters(), clip_gradient)
+            self._timer(stop="opt: clip grad norm", start="opt: step")
+            optimizer.step()
         self._timer(stop="opt: step")
 
     def check_early_stopping(self, best_loss, best_model, best_epoch, loss, i_epoch, early_stopping_patience=None):
@@ -573,8 +671,8 @@ class Trainer(object):
 
 
 class RatioTrainer(Trainer):
-    def __init__(self, model, run_on_gpu=True, double_precision=False, n_workers=4):
-        super(RatioTrainer, self).__init__(model, run_on_gpu, double_precision, n_workers)
+    def __init__(self, model, run_on_gpu=True, double_precision=False, n_workers=4, prefetch_factor=2, amp="off", drop_last=False, gpu_dataset=False):
+        super(RatioTrainer, self).__init__(model, run_on_gpu, double_precision, n_workers, prefetch_factor, amp, drop_last, gpu_dataset)
 
     def check_data(self, data):
         data_keys = list(data.keys())
@@ -588,7 +686,12 @@ class RatioTrainer(Trainer):
         self._timer(stop="fwd: move data", start="fwd: check for nans")
         self._timer(start="fwd: model.forward", stop="fwd: check for nans")
 
-        r_hat, s_hat= self.model(x)
+        # Only the model forward runs in reduced precision; BCE-based losses
+        # are unsafe under autocast, so outputs are cast back to float32 first
+        with self._autocast():
+            r_hat, s_hat = self.model(x)
+        r_hat = r_hat.float()
+        s_hat = s_hat.float()
 
         self._timer(stop="fwd: model.forward", start="fwd: check for nans")
         self._check_for_nans("Model output", s_hat, r_hat)
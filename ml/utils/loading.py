@@ -8,6 +8,7 @@ import pickle
 import numpy as np
 import tracemalloc
 import gc
+from concurrent.futures import ThreadPoolExecutor
 # import pandas as pd
 import seaborn as sns
 # from pandas.plotting import scatter_matrix
@@ -29,9 +30,30 @@ class Loader():
     """
     Loading of data.
     """
+    # Shared writer thread for the dataset cache, mirroring the checkpoint
+    # executor in ml.base: the arrays are returned to the caller immediately
+    # while the npy files land on disk in the background
+    _save_executor = None
+
     def __init__(self):
         super(Loader, self).__init__()
         self.Filter=None
+        self._pending_save = None
+
+    @classmethod
+    def _get_save_executor(cls):
+        if Loader._save_executor is None:
+            Loader._save_executor = ThreadPoolExecutor(max_workers=1)
+        return Loader._save_executor
+
+    def wait_for_save(self):
+        """
+        Blocks until the background dataset-cache write from `loading()` has
+        finished, re-raising any exception it hit.
+        """
+        if self._pending_save is not None:
+            self._pending_save.result()
+            self._pending_save = None
 
     def loading(
         self,
@@ -250,30 +272,30 @@ class Loader():
         X0_train, X0_val,  y0_train, y0_val, w0_train, w0_val =  train_test_split(X0_train, y0_train, w0_train, test_size=0.50, random_state=42)
         X1_train, X1_val,  y1_train, y1_val, w1_train, w1_val =  train_test_split(X1_train, y1_train, w1_train, test_size=0.50, random_state=42)
 
-        print("x0_train size: {}".format(X0_train.shape))
-        print("x0_test size:  {}".format(X0_test.shape))
-        print("x0_val size:   {}".format(X0_val.shape))
+        logger.info("x0_train size: {}".format(X0_train.shape))
+        logger.info("x0_test size:  {}".format(X0_test.shape))
+        logger.info("x0_val size:   {}".format(X0_val.shape))
 
-        print("x1_train size: {}".format(X1_train.shape))
-        print("x1_test size:  {}".format(X1_test.shape))
-        print("x1_val size:   {}".format(X1_val.shape))
+        logger.info("x1_train size: {}".format(X1_train.shape))
+        logger.info("x1_test size:  {}".format(X1_test.shape))
+        logger.info("x1_val size:   {}".format(X1_val.shape))
 
-        print("y0_train size: {}".format(y0_train.shape))
-        print("y0_test size:  {}".format(y0_test.shape))
-        print("y0_val size:   {}".format(y0_val.shape))
+        logger.info("y0_train size: {}".format(y0_train.shape))
+        logger.info("y0_test size:  {}".format(y0_test.shape))
+        logger.info("y0_val size:   {}".format(y0_val.shape))
 
-        print("y1_train size: {}".format(y1_train.shape))
-        print("y1_test size:  {}".format(y1_test.shape))
-        print("y1_val size:   {}".format(y1_val.shape))
+        logger.info("y1_train size: {}".format(y1_train.shape))
+        logger.info("y1_test size:  {}".format(y1_test.shape))
+        logger.info("y1_val size:   {}".format(y1_val.shape))
 
-        print("w0_train size: {}".format(w0_train.shape))
-        print("w0_test size:  {}".format(w0_test.shape))
-        print("w0_val size:   {}".format(w0_val.shape))
+        logger.info("w0_train size: {}".format(w0_train.shape))
+        logger.info("w0_test size:  {}".format(w0_test.shape))
+        logger.info("w0_val size:   {}".format(w0_val.shape))
 
-        print("w1_train size: {}".format(w1_train.shape))
-        print("w1_test size:  {}".format(w1_test.shape))
-        print("w1_val size:   {}".format(w1_val.shape))
-        print("++++++++++++++++++++++++++++++++")
+        logger.info("w1_train size: {}".format(w1_train.shape))
+        logger.info("w1_test size:  {}".format(w1_test.shape))
+        logger.info("w1_val size:   {}".format(w1_val.shape))
+        logger.info("++++++++++++++++++++++++++++++++")
 
         if algorithms is not None and "subsample" in algorithms:
             # Extract the feature names from the columns of the dataframe - used in sub-sampling
@@ -289,29 +311,29 @@ class Loader():
             X1_val, w1_val, y1_val       = subsample(X1_val,   w1_val,   1, int(w0_val.shape[0]   * ratio), global_name, featureNames="x1_val_"+featureNames) 
             X1_test, w1_test, y1_test    = subsample(X1_test,  w1_test,  1, int(w0_test.shape[0]  * ratio), global_name, featureNames="x1_test_"+featureNames) 
 
-        print("x0_train size: {}".format(X0_train.shape))
-        print("x0_test size:  {}".format(X0_test.shape))
-        print("x0_val size:   {}".format(X0_val.shape))
+        logger.info("x0_train size: {}".format(X0_train.shape))
+        logger.info("x0_test size:  {}".format(X0_test.shape))
+        logger.info("x0_val size:   {}".format(X0_val.shape))
 
-        print("x1_train size: {}".format(X1_train.shape))
-        print("x1_test size:  {}".format(X1_test.shape))
-        print("x1_val size:   {}".format(X1_val.shape))
+        logger.info("x1_train size: {}".format(X1_train.shape))
+        logger.info("x1_test size:  {}".format(X1_test.shape))
+        logger.info("x1_val size:   {}".format(X1_val.shape))
 
-        print("y0_train size: {}".format(y0_train.shape))
-        print("y0_test size:  {}".format(y0_test.shape))
-        print("y0_val size:   {}".format(y0_val.shape))
+        logger.info("y0_train size: {}".format(y0_train.shape))
+        logger.info("y0_test size:  {}".format(y0_test.shape))
+        logger.info("y0_val size:   {}".format(y0_val.shape))
 
-        print("y1_train size: {}".format(y1_train.shape))
-        print("y1_test size:  {}".format(y1_test.shape))
-        print("y1_val size:   {}".format(y1_val.shape))
+        logger.info("y1_train size: {}".format(y1_train.shape))
+        logger.info("y1_test size:  {}".format(y1_test.shape))
+        logger.info("y1_val size:   {}".format(y1_val.shape))
 
-        print("w0_train size: {}".format(w0_train.shape))
-        print("w0_test size:  {}".format(w0_test.shape))
-        print("w0_val size:   {}".format(w0_val.shape))
+        logger.info("w0_train size: {}".format(w0_train.shape))
+        logger.info("w0_test size:  {}".format(w0_test.shape))
+        logger.info("w0_val size:   {}".format(w0_val.shape))
 
-        print("w1_train size: {}".format(w1_train.shape))
-        print("w1_test size:  {}".format(w1_test.shape))
-        print("w1_val size:   {}".format(w1_val.shape))
+        logger.info("w1_train size: {}".format(w1_train.shape))
+        logger.info("w1_test size:  {}".format(w1_test.shape))
+        logger.info("w1_val size:   {}".format(w1_val.shape))
 
 
         #cliping large weights, and replace it by 1.0
@@ -394,42 +416,46 @@ class Loader():
         # y = np.concatenate((y0, y1), axis=None)
         # w = np.concatenate((w0, w1), axis=None)
 
-        # save data
+        # save data in the background; callers that need the files on disk
+        # (cache manifests, tarballs) synchronize through wait_for_save()
         if folder is not None and save:
-            np.save(folder + global_name + "/X_train_" +str(nentries)+".npy", X_train)
-            np.save(folder + global_name + "/y_train_" +str(nentries)+".npy", y_train)
-            np.save(folder + global_name + "/w_train_" +str(nentries)+".npy", w_train)
-
-            X_val = np.vstack([X0_val, X1_val])
-            np.save(folder + global_name + "/X_val_"   +str(nentries)+".npy", X_val)
-            X_val = None
-
-            y_val = np.concatenate((y0_val, y1_val), axis=None)
-            np.save(folder + global_name + "/y_val_"   +str(nentries)+".npy", y_val)
-            y_val = None
-
-            w_val = np.concatenate((w0_val, w1_val), axis=None)
-            np.save(folder + global_name + "/w_val_"   +str(nentries)+".npy", w_val)
-            w_val = None
-
-            np.save(folder + global_name + "/X0_val_"  +str(nentries)+".npy", X0_val)
-            np.save(folder + global_name + "/X1_val_"  +str(nentries)+".npy", X1_val)
-            np.save(folder + global_name + "/w0_val_"  +str(nentries)+".npy", w0_val)
-            np.save(folder + global_name + "/w1_val_"  +str(nentries)+".npy", w1_val)
-            np.save(folder + global_name + "/X0_train_"+str(nentries)+".npy", X0_train)
-            np.save(folder + global_name + "/X1_train_"+str(nentries)+".npy", X1_train)
-            np.save(folder + global_name + "/w0_train_"  +str(nentries)+".npy", w0_train)
-            np.save(folder + global_name + "/w1_train_"  +str(nentries)+".npy", w1_train)
-            if large_weight_clipping or weight_preprocess:
-                np.save(folder + global_name + "/w0_train_raw_"  +str(nentries)+".npy", raw_w0_train)
-                np.save(folder + global_name + "/w1_train_raw_"  +str(nentries)+".npy", raw_w1_train)
-                np.save(folder + global_name + "/w0_val_raw_"  +str(nentries)+".npy", raw_w0_val)
-                np.save(folder + global_name + "/w1_val_raw_"  +str(nentries)+".npy", raw_w1_val)
-            f = open(folder + global_name + "/metaData_"+str(nentries)+".pkl", "wb")
-            pickle.dump(metaData, f)
-            f.close()
+            def _write_cache():
+                np.save(folder + global_name + "/X_train_" +str(nentries)+".npy", X_train)
+                np.save(folder + global_name + "/y_train_" +str(nentries)+".npy", y_train)
+                np.save(folder + global_name + "/w_train_" +str(nentries)+".npy", w_train)
+
+                X_val = np.vstack([X0_val, X1_val])
+                np.save(folder + global_name + "/X_val_"   +str(nentries)+".npy", X_val)
+
+                y_val = np.concatenate((y0_val, y1_val), axis=None)
+                np.save(folder + global_name + "/y_val_"   +str(nentries)+".npy", y_val)
+
+                w_val = np.concatenate((w0_val, w1_val), axis=None)
+                np.save(folder + global_name + "/w_val_"   +str(nentries)+".npy", w_val)
+
+                np.save(folder + global_name + "/X0_val_"  +str(nentries)+".npy", X0_val)
+                np.save(folder + global_name + "/X1_val_"  +str(nentries)+".npy", X1_val)
+                np.save(folder + global_name + "/w0_val_"  +str(nentries)+".npy", w0_val)
+                np.save(folder + global_name + "/w1_val_"  +str(nentries)+".npy", w1_val)
+                np.save(folder + global_name + "/X0_train_"+str(nentries)+".npy", X0_train)
+                np.save(folder + global_name + "/X1_train_"+str(nentries)+".npy", X1_train)
+                np.save(folder + global_name + "/w0_train_"  +str(nentries)+".npy", w0_train)
+                np.save(folder + global_name + "/w1_train_"  +str(nentries)+".npy", w1_train)
+                if large_weight_clipping or weight_preprocess:
+                    np.save(folder + global_name + "/w0_train_raw_"  +str(nentries)+".npy", raw_w0_train)
+                    np.save(folder + global_name + "/w1_train_raw_"  +str(nentries)+".npy", raw_w1_train)
+                    np.save(folder + global_name + "/w0_val_raw_"  +str(nentries)+".npy", raw_w0_val)
+                    np.save(folder + global_name + "/w1_val_raw_"  +str(nentries)+".npy", raw_w1_val)
+                f = open(folder + global_name + "/metaData_"+str(nentries)+".pkl", "wb")
+                pickle.dump(metaData, f)
+                f.close()
+
+            self.wait_for_save()
+            self._pending_save = self._get_save_executor().submit(_write_cache)
+
             #Tar data files if training is done on GPU
             if torch.cuda.is_available() and not noTar:
+                self.wait_for_save()  # the tarball needs the files on disk
                 plot = False #don't plot on GPU...
                 tar = tarfile.open("data_out.tar.gz", "w:gz")
                 for name in [folder + global_name + "/X_train_" +str(nentries)+".npy",
@@ -524,6 +550,16 @@ class Loader():
             with open(ext_binning, "r") as f:
                 ext_binning = yaml.load(f, yaml.FullLoader)
 
+        # Check for integer values in plotting data only, this indicates that no capping on data range needed
+        #  as integer values indicate well bounded data.
+        # One fused pass over all columns instead of two np.percentile calls
+        # plus an integer scan per feature
+        n_plot = len(metaDataDict)
+        int_cols = np.all(np.equal(X0[:, :n_plot], np.trunc(X0[:, :n_plot])), axis=0)
+        neg_cols = np.any(X0[:, :n_plot] < 0, axis=0)
+        col_mins, p98, p100 = np.percentile(X0[:, :n_plot], [0.0, 98.0, 100.0], axis=0)
+        col_maxs = np.where(int_cols | neg_cols, p100, p98)
+
         #for idx,column in enumerate(x0df.columns):
         for idx,(key,pair) in enumerate(metaDataDict.items()):
 
@@ -536,20 +572,11 @@ class Loader():
                 except KeyError:
                     pass
 
-            #max = x0df[column].max()
-            # Check for integer values in plotting data only, this indicates that no capping on data range needed
-            #  as integer values indicate well bounded data
-            intTest = [ (i % 1) == 0  for i in X0[:,idx] ]
-            intTest = all(intTest) #np.all(intTest == True)
-            upperThreshold = 100 if intTest or np.any(X0[:,idx] < 0) else 98
-            max = np.percentile(X0[:,idx], upperThreshold)
-            lowerThreshold = 0 if (np.any(X0[:,idx] < 0 ) or intTest) else 0
-            min = np.percentile(X0[:,idx], lowerThreshold)
-            minmax[idx] = [min,max]
-            binning[idx] = np.linspace(min, max, divisions)
+            minmax[idx] = [col_mins[idx], col_maxs[idx]]
+            binning[idx] = np.linspace(col_mins[idx], col_maxs[idx], divisions)
             if verbose:
-                logger.info("<loading.py::load_result>::   Column {}:  min  =  {},  max  =  {}".format(column,min,max))
-                print(binning[idx])       
+                logger.info("<loading.py::load_result>::   Column {}:  min  =  {},  max  =  {}".format(key, col_mins[idx], col_maxs[idx]))
+                logger.info("%s", binning[idx])
 
         # no point in plotting distributions with too few events, they only look bad
         #if int(nentries) > 5000:
@@ -350,7 +350,12 @@ def create_missing_folders(folders):
             raise OSError("Path {} exists, but is no directory!".format(folder))
 
 
-def load_and_check(filename, warning_threshold=1.0e9, memmap_files_larger_than_gb=None, name=None):
+def load_and_check(filename, warning_threshold=1.0e9, memmap_files_larger_than_gb=None, name=None, memmap_mode="c"):
+    """
+    Loads an array (or passes one through). Files above memmap_files_larger_than_gb
+    are opened as memory maps; memmap_mode "c" keeps the file read-only
+    (copy-on-write), "r+" lets downstream transforms operate in-place on disk.
+    """
     if filename is None:
         return None
 
@@ -363,14 +368,14 @@ def load_and_check(filename, warning_threshold=1.0e9, memmap_files_larger_than_g
         data = filename
         memmap = False
     else:
-        filesize_gb = os.stat(filename).st_size / 1.0 * 1024 ** 3
+        filesize_gb = os.stat(filename).st_size / 1024 ** 3
         if memmap_files_larger_than_gb is None or filesize_gb <= memmap_files_larger_than_gb:
             logger.info("  Loading %s into RAM", filename)
             data = np.load(filename)
             memmap = False
         else:
             logger.info("  Loading %s as memory map", filename)
-            data = np.load(filename, mmap_mode="c")
+            data = np.load(filename, mmap_mode=memmap_mode)
             memmap = True
 
     if not memmap:
@@ -50,8 +50,8 @@ if __name__ == "__main__":
    for idx,(key,pair) in enumerate(metaDataDict.items()):
       
       #  Integers values indicate well bounded data, so use full range
-      intTest = [ (i % 1) == 0  for i in x0_train_array[:,idx] ]
-      intTest = all(intTest) #np.all(intTest == True)
+      col = x0_train_array[:,idx]
+      intTest = bool(np.all(col == np.trunc(col)))  # vectorized, no per-element Python
       upperThreshold = 100 if intTest else 99
       max = np.nanpercentile(x0_train_array[:,idx], upperThreshold)
       lowerThreshold = 0 if (np.any(x0_train_array[:,idx] < 0 ) or intTest) else 0
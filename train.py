@@ -1,11 +1,15 @@
 import os
 import sys
+import json
+import hashlib
 import logging
 #import argparse
 import tarfile
 import pickle
 import pathlib
 import numpy as np
+import torch
+import torch.distributed as dist
 from arg_handler import arg_handler_train
 from ml import RatioEstimator
 from ml import Loader
@@ -44,48 +48,174 @@ clippingQuantile = opts.clippingQuantile
 #################################################
 
 #################################################
-# Loading of data from root of numpy arrays
-loading = Loader()
-if BoolFilter != None:
-    InputFilter = Filter(FilterString = BoolFilter)
-    loading.Filter= InputFilter
+# Multi-GPU: when launched under torchrun each process trains on its own
+# shard/card (DistributedDataParallel inside the trainer); only rank 0
+# pre-processes data and writes outputs
+distributed = "RANK" in os.environ and "WORLD_SIZE" in os.environ
+if distributed:
+    dist.init_process_group("nccl" if torch.cuda.is_available() else "gloo")
+    if torch.cuda.is_available():
+        torch.cuda.set_device(int(os.environ.get("LOCAL_RANK", 0)))
+is_main_process = (not distributed) or dist.get_rank() == 0
+# One chatty rank is enough; the others only surface warnings, which also
+# avoids N processes contending for the same stdout lock
+if not is_main_process:
+    logging.getLogger().setLevel(logging.WARNING)
+
+# Fixed batch shapes make cuDNN autotuning a clear win, and TF32 tensor
+# cores are free accuracy-wise at this model size; --deterministic keeps
+# the PyTorch defaults for bit-reproducible runs
+if torch.cuda.is_available() and not opts.deterministic:
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+#################################################
+
+#################################################
+# Every dataset path, built once; the cached and freshly-built branches
+# below (and the validation plots further down) all reuse these
+data_dir = pathlib.Path("data") / global_name
+nominal_path = pathlib.Path(p) / f"{nominal}.root"
+variation_path = pathlib.Path(p) / f"{variation}.root"
+x_path = data_dir / f"X_train_{n}.npy"
+y_path = data_dir / f"y_train_{n}.npy"
+w_path = data_dir / f"w_train_{n}.npy"
+x0_path = data_dir / f"X0_train_{n}.npy"
+x1_path = data_dir / f"X1_train_{n}.npy"
+w0_path = data_dir / f"w0_train_{n}.npy"
+w1_path = data_dir / f"w1_train_{n}.npy"
+metadata_path = data_dir / f"metaData_{n}.pkl"
+scaler_path = data_dir / f"scaler_{n}.npz"
+manifest_path = data_dir / f"manifest_{n}.json"
+quantized_x_path = data_dir / f"X_train_{n}_q.npz"
+compressed_path = data_dir / f"train_{n}.npz"
+#################################################
+
+#################################################
+# Loading of data from root of numpy arrays. The Loader is built lazily:
+# warm starts that find the pre-processed arrays on disk never pay for it
+loading = None
+
+def _get_loader():
+    global loading
+    if loading is None:
+        loading = Loader()
+        if BoolFilter != None:
+            loading.Filter = Filter(FilterString = BoolFilter)
+    return loading
 
 # Exception handling for input files - .root
-if os.path.exists(p+nominal+'.root') or os.path.exists('data/'+global_name+'/X_train_'+str(n)+'.npy'):
+if nominal_path.exists() or x_path.exists():
     logger.info(" Doing training of model with datasets: %s with %s  events.", nominal, n)
 else:
     logger.info(" Trying to do training of model with datasets: %s with %s  events.", nominal, n)
     logger.info(" This file or directory does not exist.")
     sys.exit()
 
-if os.path.exists(p+variation+'.root') or os.path.exists('data/'+global_name+'/X_train_'+str(n)+'.npy'):
+if variation_path.exists() or x_path.exists():
     logger.info(" Doing training of model with datasets: %s with %s  events.", variation, n)
 else:
     logger.info(" Trying to do training of model with datasets: %s with %s  events.", variation, n)
     logger.info(" This file or directory does not exist.")
     sys.exit()
 
-if os.path.exists(f"data/{global_name}/data_out.tar.gz"):
+if (data_dir / "data_out.tar.gz").exists():
     # tar = tarfile.open("data_out.tar.gz", "r:gz")
-    tar = tarfile.open(f"data/{global_name}/data_out.tar.gz")
+    tar = tarfile.open(data_dir / "data_out.tar.gz")
     tar.extractall()
     tar.close()
 
-# Check if already pre-processed numpy arrays exist
-if os.path.exists('data/'+global_name+'/X_train_'+str(n)+'.npy'):
+# Fingerprint of every option that influences the pre-processed npy artifacts;
+# stored in a manifest next to them so a cached dataset is only reused when it
+# was built with the same settings
+loader_settings = {
+    "nominal": nominal,
+    "variation": variation,
+    "nentries": n,
+    "features": features,
+    "weightFeature": weightFeature,
+    "treename": treename,
+    "normalise": opts.normalise_inputs,
+    "weight_nsigma": weight_sigma,
+    "weight_clipping": weight_clipping,
+    "weight_polarity": polarity,
+    "scaling": scale_method,
+    "algorithms": opts.algorithms,
+    "BoolFilter": BoolFilter,
+    "clipFeatures": clipFeatures,
+    "clippingQuantile": clippingQuantile,
+}
+loader_fingerprint = hashlib.sha256(
+    json.dumps(loader_settings, sort_keys=True, default=str).encode("utf-8")
+).hexdigest()
+def _quantize_features(arr):
+    """ Store features as uint8 with per-column min/scale. A quarter of the
+    fp32 bytes on disk, at ~0.2% per-feature resolution. """
+    arr = np.asarray(arr, dtype=np.float32)
+    mins = arr.min(axis=0)
+    scales = (arr.max(axis=0) - mins) / 255.0
+    safe_scales = np.where(scales > 0, scales, 1.0)
+    q = np.round((arr - mins) / safe_scales).astype(np.uint8)
+    np.savez(quantized_x_path, q=q, mins=mins, scales=scales)
+
+def _dequantize_features(path):
+    with np.load(path) as f:
+        return f["q"].astype(np.float32) * f["scales"] + f["mins"]
+
+def _cached_dataset_usable():
+    """ Pre-processed arrays are reused only when present and, if a manifest
+    exists, built from the same loader settings. Legacy datasets without a
+    manifest are trusted, as before. """
+    if not x_path.exists():
+        return False
+    if not manifest_path.exists():
+        logger.info(" No manifest found for cached dataset, assuming it matches.")
+        return True
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        logger.info(" Manifest for cached dataset is unreadable, re-processing.")
+        return False
+    if manifest.get("fingerprint") == loader_fingerprint:
+        return True
+    logger.info(" Cached dataset was built with different loader settings, re-processing.")
+    return False
+
+# Check if already pre-processed numpy arrays exist; non-main ranks wait
+# until rank 0 has finished building them and then read the cache
+fresh_build = False
+if distributed and not is_main_process:
+    dist.barrier()
+if _cached_dataset_usable():
     logger.info(" Loaded existing datasets ")
-    x='data/'+global_name+'/X_train_'+str(n)+'.npy'
-    y='data/'+global_name+'/y_train_'+str(n)+'.npy'
-    w='data/'+global_name+'/w_train_'+str(n)+'.npy'
-    x0='data/'+global_name+'/X0_train_'+str(n)+'.npy'
-    w0='data/'+global_name+'/w0_train_'+str(n)+'.npy'
-    x1='data/'+global_name+'/X1_train_'+str(n)+'.npy'
-    w1='data/'+global_name+'/w1_train_'+str(n)+'.npy'
-    f = open('data/'+global_name+'/metaData_'+str(n)+".pkl","rb")
-    metaData = pickle.load(f)
-    f.close()
+    if opts.quantize_inputs and quantized_x_path.exists():
+        logger.info(" Using quantized training features from %s", quantized_x_path)
+        x = _dequantize_features(quantized_x_path)
+        y = str(y_path)
+        w = str(w_path)
+    elif opts.compress_artifacts and compressed_path.exists():
+        logger.info(" Using compressed training bundle from %s", compressed_path)
+        with np.load(compressed_path) as bundle:
+            x, y, w = bundle["X"], bundle["y"], bundle["w"]
+    else:
+        x = str(x_path)
+        y = str(y_path)
+        w = str(w_path)
+    x0 = str(x0_path)
+    w0 = str(w0_path)
+    x1 = str(x1_path)
+    w1 = str(w1_path)
+    with open(metadata_path, "rb") as f:
+        metaData = pickle.load(f)
 else:
-    x, y, x0, x1, w, w0, w1, metaData = loading.loading(
+    # Derived files belong to the dataset being replaced; drop them before
+    # training so initialize_input_transform cannot adopt the old dataset's
+    # scaler statistics (the current run re-creates them)
+    for stale in (scaler_path, quantized_x_path, compressed_path):
+        if stale.exists():
+            stale.unlink()
+    x, y, x0, x1, w, w0, w1, metaData = _get_loader().loading(
         folder=f"{pathlib.Path('./data/').resolve()}/",
         plot=opts.plot_inputs,
         global_name=global_name,
@@ -97,8 +227,8 @@ else:
         correlation=True,
         preprocessing=False,
         nentries=n,
-        pathA=p+nominal+".root",
-        pathB=p+variation+".root",
+        pathA=str(nominal_path),
+        pathB=str(variation_path),
         noTar=True,
         normalise=opts.normalise_inputs,
         debug=False,
@@ -112,6 +242,32 @@ else:
         clippingQuantile = clippingQuantile,
     )
     logger.info(" Loaded new datasets ")
+    fresh_build = True
+
+def _finalize_dataset_cache():
+    """ Joins the Loader's background npy writes, then records the manifest
+    and derived artifacts. The manifest is written last so a crash mid-write
+    never leaves it pointing at partial arrays. """
+    _get_loader().wait_for_save()
+    if opts.quantize_inputs:
+        logger.info(" Saving quantized training features to %s", quantized_x_path)
+        _quantize_features(x)
+    if opts.compress_artifacts:
+        logger.info(" Saving compressed training bundle to %s", compressed_path)
+        np.savez_compressed(compressed_path, X=np.asarray(x), y=np.asarray(y), w=np.asarray(w))
+    # Record how the artifacts were built so later runs can trust the cache;
+    # written to a temp file and moved into place so readers never see a
+    # partial manifest
+    tmp = str(manifest_path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"fingerprint": loader_fingerprint, "settings": loader_settings}, f)
+    os.replace(tmp, manifest_path)
+
+if distributed and is_main_process:
+    if fresh_build:
+        _finalize_dataset_cache()
+        fresh_build = False
+    dist.barrier()
 #######################################
 
 #######################################
@@ -130,7 +286,15 @@ if opts.dropout_prob is not None:
 # per epoch plotting
 intermediate_train_plot = None
 intermediate_save = None
+if distributed and not is_main_process:
+    # plotting and checkpointing are rank-0 jobs
+    per_epoch_plot = False
+    per_epoch_save = False
 if per_epoch_plot:
+    if fresh_build:
+        # the per-epoch plots read the validation arrays back from disk
+        _get_loader().wait_for_save()
+    x0_val_path = str(data_dir / f"X0_val_{n}.npy")
     # arguments for training and validation sets for loading.load_result
     train_args = {
         "x0":x0,
@@ -150,10 +314,10 @@ if per_epoch_plot:
         "normalise" : True, # plotting
     }
     vali_args = {
-        "x0":f'data/{global_name}/X0_val_{n}.npy',
-        "x1":f'data/{global_name}/X1_val_{n}.npy',
-        "w0":f'data/{global_name}/w0_val_{n}.npy',
-        "w1":f'data/{global_name}/w1_val_{n}.npy',
+        "x0":x0_val_path,
+        "x1":str(data_dir / f"X1_val_{n}.npy"),
+        "w0":str(data_dir / f"w0_val_{n}.npy"),
+        "w1":str(data_dir / f"w1_val_{n}.npy"),
         "metaData":metaData,
         "features":features,
         "label":"val",
@@ -167,8 +331,8 @@ if per_epoch_plot:
         "normalise" : True,  # plotting
     }
     intermediate_train_plot = (
-        (estimator.evaluate, {"train":x0, "val":f'data/{global_name}/X0_val_{n}.npy'}),
-        (loading.load_result, {"train":train_args, "val":vali_args}),
+        (estimator.evaluate, {"train":x0, "val":x0_val_path}),
+        (_get_loader().load_result, {"train":train_args, "val":vali_args}),
     )
 if per_epoch_save:
     intermediate_save_args = {
@@ -215,15 +379,30 @@ train_loss, val_loss, accuracy_train, accuracy_val = estimator.train(
     plot_inputs=opts.plot_inputs,    
     nentries=n,
     loss_type=loss_type,
+    torch_compile=opts.torch_compile,
+    jit_script=opts.jit_script,
+    amp=opts.amp,
+    gpu_dataset=opts.gpu_dataset,
     n_workers=n_workers,
+    prefetch_factor=opts.prefetch_factor,
+    memmap=opts.memmap,
+    scaler_path=str(scaler_path),
+    metaData=metaData,
     #initial_lr=0.0001,
     #final_lr=0.00001,
 )
 
-# saving loss values and final trained models
-np.save(f"loss_train_{global_name}.npy", train_loss)
-np.save(f"loss_val_{global_name}.npy", val_loss)
-np.save(f"accuracy_train_{global_name}.npy", accuracy_train)
-np.save(f"accuracy_val_{global_name}.npy", accuracy_val)
-estimator.save('models/'+ global_name +'_carl_'+str(n), x, metaData, export_model = True, noTar=True)
+# saving loss values and final trained models (rank 0 only under torchrun)
+if is_main_process:
+    if fresh_build:
+        # single-process runs overlap the dataset-cache writes with the
+        # whole training loop and settle them here
+        _finalize_dataset_cache()
+    np.save(f"loss_train_{global_name}.npy", train_loss)
+    np.save(f"loss_val_{global_name}.npy", val_loss)
+    np.save(f"accuracy_train_{global_name}.npy", accuracy_train)
+    np.save(f"accuracy_val_{global_name}.npy", accuracy_val)
+    estimator.save('models/'+ global_name +'_carl_'+str(n), x, metaData, export_model = True, noTar=True)
+if distributed:
+    dist.destroy_process_group()
 ########################################